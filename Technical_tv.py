@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
-from tradingview_screener import Query, Column as col
+from pandas.api.types import union_categoricals
 from typing import Optional
-import io
-import requests
 
 # ==================================================
 # PAGE CONFIG
@@ -28,164 +26,394 @@ PRESETS = {
     "Unusual Volume": "unusual_volume",
 }
 
-st.sidebar.header("📌 Preset Filters")
-preset_label = st.sidebar.selectbox("Select Preset", PRESETS.keys())
-preset_value = PRESETS[preset_label]
+# Widgets inside the form only rerun the script on submit.
+with st.sidebar.form("screener_filters"):
+    st.header("📌 Preset Filters")
+    preset_label = st.selectbox("Select Preset", PRESETS.keys())
+    preset_value = PRESETS[preset_label]
 
-# ==================================================
-# TECHNICAL FILTERS
-# ==================================================
-st.sidebar.header("📉 Momentum Filters")
+    # ==================================================
+    # TECHNICAL FILTERS
+    # ==================================================
+    st.header("📉 Momentum Filters")
 
-min_rsi = st.sidebar.slider("RSI Min", 0, 100, 40)
-max_rsi = st.sidebar.slider("RSI Max", 0, 100, 75)
+    min_rsi = st.slider("RSI Min", 0, 100, 40)
+    max_rsi = st.slider("RSI Max", 0, 100, 75)
 
-st.sidebar.header("📊 Trend Filters")
+    st.header("📊 Trend Filters")
 
-adx_min = st.sidebar.slider("ADX Min (Trend Strength)", 0, 60, 20)
+    adx_min = st.slider("ADX Min (Trend Strength)", 0, 60, 20)
 
-trend_direction = st.sidebar.selectbox(
-    "Trend Direction",
-    ["Any", "Bullish (+DI > -DI)", "Bearish (-DI > +DI)"]
-)
+    trend_direction = st.selectbox(
+        "Trend Direction",
+        ["Any", "Bullish (+DI > -DI)", "Bearish (-DI > +DI)"]
+    )
 
-st.sidebar.header("📐 EMA Filters")
+    st.header("📐 EMA Filters")
 
-ema20 = st.sidebar.checkbox("Price > EMA 20", True)
-ema50 = st.sidebar.checkbox("Price > EMA 50", True)
-ema200 = st.sidebar.checkbox("Price > EMA 200", False)
+    ema20 = st.checkbox("Price > EMA 20", True)
+    ema50 = st.checkbox("Price > EMA 50", True)
+    ema200 = st.checkbox("Price > EMA 200", False)
 
-st.sidebar.header("📦 Bollinger Band Filters")
+    st.header("📦 Bollinger Band Filters")
 
-bb_condition = st.sidebar.selectbox(
-    "Bollinger Condition",
-    ["Any", "Near Lower Band", "Above Upper Band"]
-)
+    bb_condition = st.selectbox(
+        "Bollinger Condition",
+        ["Any", "Near Lower Band", "Above Upper Band"]
+    )
 
-st.sidebar.header("🎯 Stochastic Filters")
+    st.header("🎯 Stochastic Filters")
 
-stoch_mode = st.sidebar.selectbox(
-    "Stochastic Mode",
-    ["Any", "Oversold (<20)", "Overbought (>80)", "Bullish (%K > %D)", "Bearish (%K < %D)"]
-)
+    stoch_mode = st.selectbox(
+        "Stochastic Mode",
+        ["Any", "Oversold (<20)", "Overbought (>80)", "Bullish (%K > %D)", "Bearish (%K < %D)"]
+    )
+
+    st.header("🔊 Liquidity")
 
-st.sidebar.header("🔊 Liquidity")
+    min_volume = st.number_input("Min Volume", value=100000)
 
-min_volume = st.sidebar.number_input("Min Volume", value=100000)
+    limit = st.slider("Stocks per Page", 10, 200, 25)
 
-limit = st.sidebar.slider("Number of Stocks", 10, 200, 50)
+    st.header("🏛️ Exchanges")
 
-run_scan = st.sidebar.button("🚀 Run Screener")
+    split_exchanges = st.checkbox("Scan NSE and BSE in parallel", False)
+
+    run_scan = st.form_submit_button("🚀 Run Screener")
 
 # ==================================================
 # TECHNICAL SCAN FUNCTION
 # ==================================================
-def run_technical_scan(preset: Optional[str]) -> pd.DataFrame:
-    try:
-        q = (
-            Query()
-            .set_markets("india")
-            .select(
-                "name",
-                "sector",
-                "close",
-                "change",
-                "volume",
-                "RSI",
-                "EMA20",
-                "EMA50",
-                "EMA200",
-                "BB.upper",
-                "BB.lower",
-                "Stoch.K",
-                "Stoch.D",
-                "ADX",
-                "ADX+DI",
-                "ADX-DI",
-            )
-            .where(
-                col("type") == "stock",
-                col("typespecs").has("common"),
-                col("is_primary") == True,
-                col("RSI") >= min_rsi,
-                col("RSI") <= max_rsi,
-                col("volume") >= min_volume,
-                col("ADX") >= adx_min,
-            )
-            .limit(limit)
-        )
-
-        # EMA CONDITIONS
-        if ema20:
-            q = q.where(col("close") > col("EMA20"))
-        if ema50:
-            q = q.where(col("close") > col("EMA50"))
-        if ema200:
-            q = q.where(col("close") > col("EMA200"))
-
-        # ADX DIRECTION
-        if trend_direction == "Bullish (+DI > -DI)":
-            q = q.where(col("ADX+DI") > col("ADX-DI"))
-        elif trend_direction == "Bearish (-DI > +DI)":
-            q = q.where(col("ADX-DI") > col("ADX+DI"))
-
-        # BOLLINGER
-        if bb_condition == "Near Lower Band":
-            q = q.where(col("close") <= col("BB.lower") * 1.02)
-        elif bb_condition == "Above Upper Band":
-            q = q.where(col("close") > col("BB.upper"))
-
-        # STOCHASTIC
-        if stoch_mode == "Oversold (<20)":
-            q = q.where(col("Stoch.K") < 20)
-        elif stoch_mode == "Overbought (>80)":
-            q = q.where(col("Stoch.K") > 80)
-        elif stoch_mode == "Bullish (%K > %D)":
-            q = q.where(col("Stoch.K") > col("Stoch.D"))
-        elif stoch_mode == "Bearish (%K < %D)":
-            q = q.where(col("Stoch.K") < col("Stoch.D"))
+COLUMNS_DISPLAY = (
+    "name",
+    "sector",
+    "close",
+    "change",
+    "volume",
+    "RSI",
+    "EMA20",
+    "EMA50",
+    "EMA200",
+    "ADX",
+)
 
+# Indicator columns that are sorted on; TradingView may hand them back as
+# object dtype, which forces per-element Python arithmetic
+NUMERIC_COLUMNS = ("close", "RSI", "EMA20", "EMA50", "EMA200", "ADX")
+
+CATEGORY_COLUMNS = ("name", "sector")
+
+@st.cache_resource
+def _http_session():
+    # Script globals are rebuilt on every rerun; cache_resource keeps one
+    # keep-alive session (and its TLS connections) for the app's lifetime.
+    # It is shared by every browser session, so it must not keep cookies.
+    import requests
+    from http.cookiejar import DefaultCookiePolicy
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+    return session
+
+def _fetch(session, q) -> tuple[int, pd.DataFrame]:
+    # Same request and frame as Query.get_scanner_data, but sent through
+    # the pooled session instead of the module-level requests.post
+    from tradingview_screener.query import HEADERS
+
+    r = session.post(q.url, json=q.query, headers=HEADERS, timeout=30)
+    r.raise_for_status()
+    payload = r.json()
+    df = pd.DataFrame(
+        ([row["s"], *row["d"]] for row in payload["data"]),
+        columns=["ticker", *q.query["columns"]],
+    )
+    return payload["totalCount"], df
+
+@st.cache_data(ttl=60, max_entries=64, show_spinner=False)
+def run_technical_scan(
+    preset: Optional[str],
+    min_rsi: int,
+    max_rsi: int,
+    adx_min: int,
+    trend_direction: str,
+    ema20: bool,
+    ema50: bool,
+    ema200: bool,
+    bb_condition: str,
+    stoch_mode: str,
+    min_volume: int,
+    split_exchanges: bool,
+    offset: int,
+    limit: int,
+) -> tuple[pd.DataFrame, tuple[int, ...]]:
+    # Deferred so filter edits and idle reruns don't pay for these imports
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+    from tradingview_screener import Query, Column as col
+
+    # Predicates are evaluated server-side, so indicator columns only
+    # need to come back when their filter is active
+    cols = list(COLUMNS_DISPLAY)
+    if trend_direction != "Any":
+        cols += ["ADX+DI", "ADX-DI"]
+    if bb_condition != "Any":
+        cols += ["BB.upper", "BB.lower"]
+    if stoch_mode != "Any":
+        cols += ["Stoch.K", "Stoch.D"]
+
+    preds = [
+        col("type") == "stock",
+        col("typespecs").has("common"),
+        col("is_primary") == True,
+        col("RSI") >= min_rsi,
+        col("RSI") <= max_rsi,
+        col("volume") >= min_volume,
+        col("ADX") >= adx_min,
+    ]
+
+    # EMA CONDITIONS
+    if ema20:
+        preds.append(col("close") > col("EMA20"))
+    if ema50:
+        preds.append(col("close") > col("EMA50"))
+    if ema200:
+        preds.append(col("close") > col("EMA200"))
+
+    # ADX DIRECTION
+    if trend_direction == "Bullish (+DI > -DI)":
+        preds.append(col("ADX+DI") > col("ADX-DI"))
+    elif trend_direction == "Bearish (-DI > +DI)":
+        preds.append(col("ADX-DI") > col("ADX+DI"))
+
+    # BOLLINGER
+    if bb_condition == "Near Lower Band":
+        preds.append(col("close") <= col("BB.lower") * 1.02)
+    elif bb_condition == "Above Upper Band":
+        preds.append(col("close") > col("BB.upper"))
+
+    # STOCHASTIC
+    if stoch_mode == "Oversold (<20)":
+        preds.append(col("Stoch.K") < 20)
+    elif stoch_mode == "Overbought (>80)":
+        preds.append(col("Stoch.K") > 80)
+    elif stoch_mode == "Bullish (%K > %D)":
+        preds.append(col("Stoch.K") > col("Stoch.D"))
+    elif stoch_mode == "Bearish (%K < %D)":
+        preds.append(col("Stoch.K") < col("Stoch.D"))
+
+    # "india" is a single scanner market; a split scan narrows it per
+    # exchange so the two requests can be in flight at the same time
+    exchanges = ("NSE", "BSE") if split_exchanges else (None,)
+    queries = []
+    for exchange in exchanges:
+        exchange_preds = preds if exchange is None else preds + [col("exchange") == exchange]
+
+        q = Query().set_markets("india")
+
+        # PRESET (server-side pre-filter, attached before the predicates)
         if preset:
             q = q.set_property("preset", preset)
 
-        _, df = q.get_scanner_data(timeout=30)
-        return df
+        # Ordered server-side so "Load more" pages continue the ADX ranking
+        queries.append(
+            q.select(*cols)
+            .where(*exchange_preds)
+            .order_by("ADX", ascending=False)
+            .offset(offset)
+            .limit(offset + limit)  # range end index, not a row count
+        )
+
+    # Resolved here: st.* caches need the script thread's context
+    session = _http_session()
+    if len(queries) == 1:
+        results = [_fetch(session, queries[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = list(pool.map(partial(_fetch, session), queries))
+
+    # One totalCount per exchange queried; each exchange pages independently
+    totals = tuple(count for count, _ in results)
+    # An exhausted exchange returns an empty, object-typed frame that would
+    # upcast the numeric columns of the other
+    frames = [frame for _, frame in results if not frame.empty] or [results[0][1]]
+    df = pd.concat(frames, ignore_index=True)
+
+    for c in NUMERIC_COLUMNS:
+        if c in df:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    # Numbers stay float64 so the exports keep exact prices; the repeated
+    # text columns are what categoricals shrink. Going through "string"
+    # first gives every page the same category dtype, even an all-null one
+    for c in CATEGORY_COLUMNS:
+        if c in df:
+            df[c] = df[c].astype("string").astype("category")
+
+    return df, totals
+
+def has_more_rows(offset: int, page_size: int, totals: tuple) -> bool:
+    return any(offset + page_size < total for total in totals)
+
+def safe_scan(*scan_args) -> Optional[tuple[pd.DataFrame, tuple]]:
+    # Errors are reported here, outside the cache, so a failed request is
+    # never memoized and the next click retries it
+    import requests
 
+    try:
+        return run_technical_scan(*scan_args)
     except requests.exceptions.HTTPError:
         st.error("TradingView rejected the request. Reduce filters.")
-        return pd.DataFrame()
     except Exception as e:
         st.error(f"Unexpected error: {e}")
-        return pd.DataFrame()
+    return None
+
+# ==================================================
+# EXPORT
+# ==================================================
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+@st.cache_resource
+def _xlsx_buffer():
+    # Script globals don't survive reruns, so the reusable buffer lives in
+    # the resource cache; the lock guards it across concurrent sessions
+    import io
+    import threading
+
+    return io.BytesIO(), threading.Lock()
+
+@st.cache_data(show_spinner=False)
+def to_xlsx_bytes(df: pd.DataFrame) -> bytes:
+    output, lock = _xlsx_buffer()
+    with lock:
+        output.seek(0)
+        output.truncate(0)
+        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+            df.to_excel(writer, index=False, sheet_name="Technical")
+        return output.getvalue()
+
+# ==================================================
+# PAGINATION
+# ==================================================
+def append_page(df: pd.DataFrame, page: pd.DataFrame) -> pd.DataFrame:
+    # concat falls back to object dtype when the categories differ
+    for c in CATEGORY_COLUMNS:
+        if c in df and c in page:
+            categories = union_categoricals([df[c], page[c]]).categories
+            df = df.assign(**{c: df[c].cat.set_categories(categories)})
+            page = page.assign(**{c: page[c].cat.set_categories(categories)})
+    # Pages are cached separately, so a later page can come from a newer
+    # ADX ranking that moved a stock already shown into its range
+    return pd.concat([df, page]).drop_duplicates("ticker", ignore_index=True)
+
+def load_more() -> None:
+    offset = st.session_state.offset + st.session_state.page_size
+    result = safe_scan(*st.session_state.scan_args, offset, st.session_state.page_size)
+    if result is None:
+        return
+
+    new_df, totals = result
+    st.session_state.offset = offset
+    st.session_state.has_more = has_more_rows(offset, st.session_state.page_size, totals)
+    if new_df.empty:
+        return
+
+    st.session_state.last_df = append_page(st.session_state.last_df, new_df)
+
+def clear_results() -> None:
+    del st.session_state.last_df
 
 # ==================================================
 # OUTPUT
 # ==================================================
+TABLE_MAX_ROWS = 100
+
+if "offset" not in st.session_state:
+    st.session_state.offset = 0
+
 if run_scan:
-    with st.spinner("Scanning Indian Markets..."):
-        df = run_technical_scan(preset_value)
+    scan_args = (
+        preset_value,
+        min_rsi,
+        max_rsi,
+        adx_min,
+        trend_direction,
+        ema20,
+        ema50,
+        ema200,
+        bb_condition,
+        stoch_mode,
+        min_volume,
+        split_exchanges,
+    )
+    # Guaranteed-empty filters never need the round-trip
+    if min_rsi > max_rsi:
+        st.warning("RSI Min is greater than RSI Max.")
+        result = None
+    else:
+        with st.spinner("Scanning Indian Markets..."):
+            result = safe_scan(*scan_args, 0, limit)
+
+    if result is None:
+        # Don't leave results from the previous filters on screen
+        st.session_state.pop("last_df", None)
+    else:
+        df, totals = result
+        st.session_state.scan_args = scan_args
+        st.session_state.page_size = limit
+        st.session_state.offset = 0
+        st.session_state.has_more = has_more_rows(0, limit, totals)
+        st.session_state.last_df = df
 
+# Reruns that aren't a new scan render the stored result without re-querying
+df = st.session_state.get("last_df")
+
+if df is not None:
     if df.empty:
         st.warning("No stocks matched the criteria.")
     else:
         st.subheader(f"📋 Results ({len(df)} stocks)")
 
-        st.dataframe(
-            df.sort_values("ADX", ascending=False),
-            use_container_width=True
-        )
+        # Pages arrive ADX-ordered, but a split scan interleaves two exchanges
+        ranked = df.sort_values("ADX", ascending=False)
+
+        # A static table is cheaper to serialize and render than the
+        # interactive grid; fall back to the grid once scrolling matters
+        if len(ranked) > TABLE_MAX_ROWS:
+            st.dataframe(
+                ranked,
+                use_container_width=True,
+                hide_index=True,
+                column_config={"volume": st.column_config.NumberColumn(format="%d")},
+            )
+        else:
+            st.table(ranked, hide_index=True)
 
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Technical")
+        if st.session_state.has_more:
+            st.button("➕ Load more", on_click=load_more)
 
         st.download_button(
-            "⬇️ Download Excel",
-            output.getvalue(),
-            "india_technical_screener.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            "⬇️ Download CSV",
+            to_csv_bytes(df),
+            "india_technical_screener.csv",
+            mime="text/csv",
         )
 
+        # xlsxwriter is slow; only build the workbook when asked for. Outside
+        # the form, so ticking it re-renders last_df instead of re-scanning
+        if st.checkbox("Need Excel?", False):
+            st.download_button(
+                "⬇️ Download Excel",
+                to_xlsx_bytes(df),
+                "india_technical_screener.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+
+    st.button("🧹 Clear", on_click=clear_results)
+
 # ==================================================
 # FOOTER
 # ==================================================